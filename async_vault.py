@@ -0,0 +1,231 @@
+import os
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+import contextlib
+from collections import OrderedDict
+from vault import (CURRENT_FORMAT, derive_key, detect_format, encrypt_with_key,
+                   decrypt_vault, decrypt_with_key, atomic_write, load_vault_file, _wipe)
+
+
+class _Handle:
+    """
+    已解锁的 Vault：缓存派生密钥与明文，保存时复用密钥免去 KDF
+    """
+
+    def __init__(self, token: bytes, key: bytearray, salt: bytes, data: dict, mtime: int):
+        self.token = token
+        self.key = key
+        self.salt = salt
+        self.data = data
+        self.mtime = mtime
+        self.last_used = time.monotonic()
+
+    def wipe(self):
+        _wipe(self.key)
+        self.data = None
+
+
+class AsyncVault:
+    """
+    供 asyncio 服务使用的 Vault 接口
+
+    KDF、AES-GCM 与文件读写都在执行器中运行，不阻塞事件循环；
+    已解锁的 Vault 按 LRU + TTL 缓存，同一文件的打开与写入串行化。
+    缓存非空时事件循环上会定期清理过期句柄，空闲的服务同样会按时清零密钥。
+    """
+
+    def __init__(self, max_open: int = 64, ttl: float = 300.0, executor=None):
+        self.max_open = max_open
+        self.ttl = ttl
+        self._executor = executor
+        self._handles = OrderedDict()
+        self._locks = {}  # 路径 -> [锁, 使用者数]
+        self._sweeper = None
+        # 进程内随机密钥，仅用于在缓存命中时比对主密码，不落盘
+        self._secret = os.urandom(32)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close_all()
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def _run(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _token(self, password: str) -> bytes:
+        return hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+
+    @contextlib.asynccontextmanager
+    async def _locked(self, path: str):
+        """
+        串行化同一文件的操作；锁没有使用者且句柄已淘汰时即丢弃，_locks 不会无限增长
+        """
+        entry = self._locks.get(path)
+        if entry is None:
+            entry = self._locks[path] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1] and path not in self._handles:
+                self._locks.pop(path, None)
+
+    def _evict(self, path: str):
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            handle.wipe()
+        entry = self._locks.get(path)
+        if entry is not None and not entry[1]:
+            del self._locks[path]
+
+    def _store(self, path: str, handle: _Handle):
+        self._evict(path)
+        self._handles[path] = handle
+        self.prune()
+        if self._sweeper is None:
+            self._schedule_sweep()
+
+    def _schedule_sweep(self):
+        # ttl 为 0 时也保留最小间隔，避免空转
+        delay = max(self.ttl / 2, 0.1)
+        self._sweeper = asyncio.get_running_loop().call_later(delay, self._sweep)
+
+    def _sweep(self):
+        """
+        定期淘汰过期句柄；缓存清空后停止，下次缓存句柄时重新启动
+        """
+        self.prune()
+        if self._handles:
+            self._schedule_sweep()
+        else:
+            self._sweeper = None
+
+    def prune(self):
+        """
+        淘汰超过 TTL 未使用的句柄，并把缓存收缩到 max_open 以内
+        """
+        deadline = time.monotonic() - self.ttl
+        for path in [p for p, h in self._handles.items() if h.last_used < deadline]:
+            self._evict(path)
+        while len(self._handles) > self.max_open:
+            self._evict(next(iter(self._handles)))
+
+    async def _cached(self, path: str, token: bytes, locked: bool):
+        """
+        返回仍有效的缓存句柄；只有持有该文件的锁时才会淘汰过期句柄，
+        否则 save 写入后、更新 mtime 前的并发 open 会误把刚保存的句柄当作过期
+        """
+        self.prune()
+        handle = self._handles.get(path)
+        if handle is None or not hmac.compare_digest(handle.token, token):
+            return None
+        st = await self._run(os.stat, path)
+        if st.st_mtime_ns != handle.mtime:
+            if locked:
+                # 文件已被其他进程修改，缓存失效
+                self._evict(path)
+            return None
+        handle.last_used = time.monotonic()
+        self._handles.move_to_end(path)
+        return handle
+
+    async def open(self, path: str, password: str) -> dict:
+        """
+        解锁 Vault 并返回明文 dict；缓存命中时不再执行 KDF
+
+        返回的 dict 即缓存中的对象，修改后调用 save 写回
+        """
+        path = os.path.abspath(path)
+        token = self._token(password)
+        handle = await self._cached(path, token, locked=False)
+        if handle is not None:
+            return handle.data
+        async with self._locked(path):
+            handle = await self._cached(path, token, locked=True)
+            if handle is not None:
+                return handle.data
+            vault_json = await self._run(load_vault_file, path)
+            if detect_format(vault_json) == CURRENT_FORMAT:
+                salt = base64.b64decode(vault_json["salt"])
+                key = bytearray(await self._run(derive_key, password, salt))
+                try:
+                    data = await self._run(decrypt_with_key, key, vault_json)
+                except Exception:
+                    _wipe(key)
+                    raise
+            else:
+                # 旧格式：按注册的格式读取，换用新的 salt 派生密钥，下次 save 即升级为当前格式
+                data = await self._run(decrypt_vault, password, vault_json)
+                salt = os.urandom(16)
+                key = bytearray(await self._run(derive_key, password, salt))
+            st = await self._run(os.stat, path)
+            self._store(path, _Handle(token, key, salt, data, st.st_mtime_ns))
+            return data
+
+    async def save(self, path: str, data: dict = None):
+        """
+        使用缓存的密钥加密并原子写入，同一文件的写入按顺序执行
+
+        文件在打开后被其他进程修改过时淘汰缓存并抛出 ValueError，不覆盖外部修改
+        """
+        path = os.path.abspath(path)
+        self.prune()
+        async with self._locked(path):
+            handle = self._handles.get(path)
+            if handle is None:
+                raise ValueError(f"Vault 未解锁或已被淘汰，请重新打开: {path}")
+            try:
+                mtime = (await self._run(os.stat, path)).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime != handle.mtime:
+                self._evict(path)
+                raise ValueError(f"Vault 文件已被其他进程修改，请重新打开: {path}")
+            if data is not None:
+                handle.data = data
+            # 句柄可能在写入期间被淘汰并清零，先复制一份密钥
+            key = bytearray(handle.key)
+            try:
+                encrypted = await self._run(encrypt_with_key, key, handle.salt, handle.data)
+            finally:
+                _wipe(key)
+            await self._run(atomic_write, path, encrypted)
+            st = await self._run(os.stat, path)
+            handle.mtime = st.st_mtime_ns
+            handle.last_used = time.monotonic()
+            if self._handles.get(path) is handle:
+                self._handles.move_to_end(path)
+
+    async def create(self, path: str, password: str, data: dict = None) -> dict:
+        """
+        新建 Vault 文件并直接缓存为已解锁状态
+        """
+        path = os.path.abspath(path)
+        data = {"entries": []} if data is None else data
+        async with self._locked(path):
+            salt = os.urandom(16)
+            key = bytearray(await self._run(derive_key, password, salt))
+            encrypted = await self._run(encrypt_with_key, key, salt, data)
+            await self._run(atomic_write, path, encrypted)
+            st = await self._run(os.stat, path)
+            self._store(path, _Handle(self._token(password), key, salt, data, st.st_mtime_ns))
+            return data
+
+    def close(self, path: str):
+        """
+        锁定指定 Vault，清零其缓存密钥
+        """
+        self._evict(os.path.abspath(path))
+
+    def close_all(self):
+        for path in list(self._handles):
+            self._evict(path)
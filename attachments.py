@@ -0,0 +1,154 @@
+import os
+import hmac
+import struct
+import hashlib
+import tempfile
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from vault import store_key, subkey, _wipe
+
+MAGIC = b"MABLOB02"
+BLOB_CHUNK = 64 * 1024
+TAG_SIZE = 16
+
+
+def blob_dir(vault_path: str) -> str:
+    return vault_path + ".blobs"
+
+
+def blob_refs(data: dict) -> set:
+    """
+    返回明文 Vault 数据中所有条目引用的附件 ID
+    """
+    return {a["blob"] for e in data.get("entries", []) for a in e.get("attachments", []) if "blob" in a}
+
+
+def _read_ahead(f, size: int):
+    """
+    逐块读取文件，并标记是否为最后一块（空文件也产生一个空的最后块）
+    """
+    cur = f.read(size)
+    while True:
+        nxt = f.read(size)
+        yield cur, not nxt
+        if not nxt:
+            return
+        cur = nxt
+
+
+class BlobStore:
+    """
+    附件的加密分块存储
+
+    每个附件按 64 KiB 分块用 AES-GCM 加密，nonce 中包含块序号和最后一块标记，
+    防止块被重排或截断；文件名为内容的 HMAC，相同内容只存一份，读取时重新校验。
+    读写都是流式的，Vault 本身只保存引用，加载 Vault 不会读取附件数据。
+    """
+
+    def __init__(self, vault_path: str, password: str):
+        self.root = blob_dir(vault_path)
+        key = store_key(self.root, password)
+        try:
+            self._aead = AESGCM(subkey(key, b"blob-enc"))
+            self._mac_key = subkey(key, b"blob-mac")
+        finally:
+            _wipe(key)
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id[2:])
+
+    def _nonce(self, prefix: bytes, index: int, last: bool) -> bytes:
+        return prefix + struct.pack(">I?", index, last)
+
+    def exists(self, blob_id: str) -> bool:
+        return os.path.exists(self._path(blob_id))
+
+    def put(self, src: str) -> dict:
+        """
+        加密存入文件并返回引用 {"blob", "size"}
+
+        源文件只读取一遍：边加密边计算 HMAC，写完后按 HMAC 重命名，
+        因此附件 ID 总与存储的内容一致；内容已存在时丢弃新写入的数据
+        """
+        os.makedirs(self.root, exist_ok=True)
+        mac = hmac.new(self._mac_key, digestmod=hashlib.sha256)
+        prefix = os.urandom(7)
+        size = 0
+        with open(src, 'rb') as fin, \
+                tempfile.NamedTemporaryFile('wb', dir=self.root, delete=False) as tf:
+            try:
+                tf.write(MAGIC + prefix + struct.pack(">I", BLOB_CHUNK))
+                for i, (chunk, last) in enumerate(_read_ahead(fin, BLOB_CHUNK)):
+                    mac.update(chunk)
+                    size += len(chunk)
+                    tf.write(self._aead.encrypt(self._nonce(prefix, i, last), chunk, MAGIC))
+                tf.flush()
+                os.fsync(tf.fileno())
+            except BaseException:
+                tf.close()
+                os.remove(tf.name)
+                raise
+        blob_id = mac.hexdigest()
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            os.remove(tf.name)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tf.name, path)
+        return {"blob": blob_id, "size": size}
+
+    def read(self, blob_id: str):
+        """
+        逐块解密附件，生成明文块；被篡改、重排、截断或与 ID 不符时抛出 ValueError，
+        与 ID 的比对在最后一块之后进行，调用方须读完全部数据再使用
+        """
+        path = self._path(blob_id)
+        if not os.path.exists(path):
+            raise ValueError(f"找不到附件数据: {blob_id}")
+        mac = hmac.new(self._mac_key, digestmod=hashlib.sha256)
+        with open(path, 'rb') as f:
+            header = f.read(len(MAGIC) + 11)
+            if len(header) < len(MAGIC) + 11 or header[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"附件数据格式无效: {blob_id}")
+            prefix = header[len(MAGIC):len(MAGIC) + 7]
+            chunk_size, = struct.unpack(">I", header[len(MAGIC) + 7:])
+            for i, (chunk, last) in enumerate(_read_ahead(f, chunk_size + TAG_SIZE)):
+                try:
+                    plain = self._aead.decrypt(self._nonce(prefix, i, last), chunk, MAGIC)
+                except InvalidTag:
+                    raise ValueError(f"附件数据已损坏或被篡改: {blob_id}")
+                mac.update(plain)
+                yield plain
+        if not hmac.compare_digest(mac.hexdigest(), blob_id):
+            # 内容完整但与 ID 不符，例如附件文件被互相替换
+            raise ValueError(f"附件数据与 ID 不符: {blob_id}")
+
+    def collect(self, live: set) -> int:
+        """
+        删除不在 live 中的附件数据，返回删除的数量
+        """
+        removed = 0
+        for prefix in os.listdir(self.root):
+            sub = os.path.join(self.root, prefix)
+            if not os.path.isdir(sub):
+                continue
+            for rest in os.listdir(sub):
+                if prefix + rest not in live:
+                    os.remove(os.path.join(sub, rest))
+                    removed += 1
+        return removed
+
+    def extract(self, blob_id: str, dst: str):
+        """
+        解密附件到 dst，全部校验通过后才替换目标文件
+        """
+        dir_name = os.path.dirname(os.path.abspath(dst))
+        with tempfile.NamedTemporaryFile('wb', dir=dir_name, delete=False) as tf:
+            try:
+                for chunk in self.read(blob_id):
+                    tf.write(chunk)
+            except Exception:
+                tf.close()
+                os.remove(tf.name)
+                raise
+        os.replace(tf.name, dst)
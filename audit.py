@@ -0,0 +1,134 @@
+import mmap
+import hashlib
+import string
+from collections import defaultdict
+
+RECORD_SIZE = 20  # SHA-1 摘要长度
+
+
+def sha1_digest(password: str) -> bytes:
+    """
+    计算密码的 SHA-1 摘要（与 HIBP 泄露库一致）
+    """
+    return hashlib.sha1(password.encode()).digest()
+
+
+def build_corpus(src: str, dst: str) -> int:
+    """
+    将 HIBP 的 "HASH:COUNT" 文本（按哈希排序版本）转换为紧凑的二进制语料，
+    每条记录 20 字节，逐行流式处理，返回写入的记录数
+    """
+    count = 0
+    prev = b""
+    with open(src, 'r', encoding='ascii') as fin, open(dst, 'wb') as fout:
+        for line in fin:
+            line = line.strip()
+            if not line:
+                continue
+            digest = bytes.fromhex(line.split(':', 1)[0])
+            if len(digest) != RECORD_SIZE:
+                raise ValueError(f"无效的 SHA-1 记录: {line}")
+            if digest < prev:
+                raise ValueError("语料未按哈希排序，请使用 HIBP 的 ordered-by-hash 版本。")
+            if digest != prev:
+                fout.write(digest)
+                count += 1
+                prev = digest
+    return count
+
+
+class BreachCorpus:
+    """
+    内存映射的已排序 SHA-1 语料，按需分页，常驻内存极小
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        size = self._file.seek(0, 2)
+        if size % RECORD_SIZE:
+            self._file.close()
+            raise ValueError(f"语料文件长度不是 {RECORD_SIZE} 的整数倍: {path}")
+        self.count = size // RECORD_SIZE
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _record(self, i: int) -> bytes:
+        off = i * RECORD_SIZE
+        return self._mm[off:off + RECORD_SIZE]
+
+    def contains_many(self, digests) -> set:
+        """
+        批量查询：先排序，后续查询的下界沿用上一次的结果，缩小二分范围
+        """
+        found = set()
+        lo = 0
+        for d in sorted(set(digests)):
+            hi = self.count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._record(mid) < d:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < self.count and self._record(lo) == d:
+                found.add(d)
+        return found
+
+    def __contains__(self, digest: bytes) -> bool:
+        return bool(self.contains_many([digest]))
+
+
+def weak_reasons(password: str, min_length: int = 12) -> list:
+    """
+    返回密码强度不足的原因列表，空列表表示未发现问题
+    """
+    reasons = []
+    if len(password) < min_length:
+        reasons.append(f"长度少于 {min_length}")
+    classes = sum([
+        any(c in string.ascii_lowercase for c in password),
+        any(c in string.ascii_uppercase for c in password),
+        any(c in string.digits for c in password),
+        any(not c.isalnum() for c in password),
+    ])
+    if classes < 3:
+        reasons.append("字符类型少于 3 种")
+    if password and len(set(password)) <= len(password) // 3:
+        reasons.append("重复字符过多")
+    return reasons
+
+
+def audit_entries(entries: list, corpus: BreachCorpus = None, min_length: int = 12) -> dict:
+    """
+    一次遍历完成泄露、复用与弱密码检查，返回各类问题涉及的条目名称；
+    weak 为按条目顺序排列的 [(名称, 原因列表)]，重名条目各自报告
+    """
+    by_digest = defaultdict(list)
+    weak = []
+    for entry in entries:
+        pw = entry.get("password")
+        if not pw:
+            continue
+        name = entry.get("name", "<Unnamed>")
+        by_digest[sha1_digest(pw)].append(name)
+        reasons = weak_reasons(pw, min_length)
+        if reasons:
+            weak.append((name, reasons))
+
+    breached = []
+    if corpus is not None:
+        for d in corpus.contains_many(by_digest):
+            breached.extend(by_digest[d])
+
+    reused = [names for names in by_digest.values() if len(names) > 1]
+    return {"breached": sorted(breached), "reused": reused, "weak": weak}
@@ -0,0 +1,224 @@
+"""
+GUI 响应性基准：无界面运行 ui.py / main_ui.py 的 PasswordManager（Qt offscreen）
+和 ui_test.py 的 VaultApp（Tk，需要 DISPLAY 或可用的 Xvfb），
+对生成的 1k–100k 条 Vault 脚本化执行打开、滚动、添加、删除，
+输出每步阻塞事件循环的时长、控件数量和 RSS。
+
+用法：
+    python bench_gui.py --sizes 1000,10000 --gui qt,tk > bench_output.txt
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from vault import encrypt_vault, decrypt_vault, atomic_write, load_vault_file
+
+PASSWORD = "bench"
+FIELDS = ['name', 'username', 'account', 'password', 'website', 'phone', 'email']
+SCROLL_STEPS = 20
+
+
+def make_vault(path: str, size: int):
+    entries = [{f: f"bench_{f}_{i}" for f in FIELDS} for i in range(size)]
+    atomic_write(path, encrypt_vault(PASSWORD, {"entries": entries}))
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextlib.contextmanager
+def patched(obj, **attrs):
+    """临时替换对象属性（用于跳过文件与密码对话框）"""
+    saved = {k: getattr(obj, k) for k in attrs}
+    for k, v in attrs.items():
+        setattr(obj, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(obj, k, v)
+
+
+class Recorder:
+    def __init__(self, gui: str, size: int, pump, widgets):
+        self.gui = gui
+        self.size = size
+        self._pump = pump
+        self._widgets = widgets
+
+    def step(self, op: str, fn, repeat: int = 1):
+        """
+        执行一步操作并处理完挂起事件；该步骤在 GUI 线程上同步执行，
+        其耗时即事件循环被阻塞的时长。repeat > 1 时报告最长的一次。
+        """
+        stalls = []
+        for i in range(repeat):
+            t = time.perf_counter()
+            fn(i)
+            self._pump()
+            stalls.append(time.perf_counter() - t)
+        print(json.dumps({
+            "gui": self.gui,
+            "size": self.size,
+            "op": op,
+            "stall_ms": round(max(stalls) * 1000, 1),
+            "total_ms": round(sum(stalls) * 1000, 1),
+            "widgets": self._widgets(),
+            "rss_mb": round(rss_mb(), 1)
+        }, ensure_ascii=False), flush=True)
+
+
+def run_qt(path: str, size: int, module: str, open_mode: str):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication, QWidget, QFileDialog, QInputDialog, QMessageBox
+    app = QApplication.instance() or QApplication([])
+    gui = __import__(module)
+    window = gui.PasswordManager()
+    window.resize(900, 600)
+    window.show()
+    app.processEvents()
+    rec = Recorder(f"qt:{module}", size, app.processEvents,
+                   lambda: len(window.findChildren(QWidget)))
+
+    def open_vault(_):
+        # open_vault 会 print 整个 Vault，丢弃输出
+        with open(os.devnull, "w") as null, contextlib.redirect_stdout(null), \
+                patched(QFileDialog, getOpenFileName=staticmethod(lambda *a, **k: (path, ""))), \
+                patched(QInputDialog, getText=staticmethod(lambda *a, **k: (PASSWORD, True))), \
+                patched(QMessageBox, critical=staticmethod(lambda *a, **k: print(*a[2:], file=sys.stderr))):
+            window.open_vault()
+
+    def open_direct(_):
+        # 只做一次解密和一次 _refresh_cards，用于在 open_vault 过慢时测量后续步骤
+        window.entries = decrypt_vault(PASSWORD, load_vault_file(path))["entries"]
+        window._refresh_cards()
+
+    def scroll(i):
+        bar = window.scroll_area.verticalScrollBar()
+        bar.setValue(bar.maximum() * (i + 1) // SCROLL_STEPS)
+
+    def add(i):
+        entry = {"name": f"added_{i}", "username": "u", "password": "p"}
+        with patched(gui.AddEntryDialog, exec_=lambda self: True, get_data=lambda self: entry):
+            window.add_entry()
+
+    def save(_):
+        out = path + ".qt"
+        with patched(QFileDialog, getSaveFileName=staticmethod(lambda *a, **k: (out, ""))), \
+                patched(QInputDialog, getText=staticmethod(lambda *a, **k: (PASSWORD, True))), \
+                patched(QMessageBox, information=staticmethod(lambda *a, **k: None),
+                        critical=staticmethod(lambda *a, **k: print(*a[2:], file=sys.stderr))):
+            window.save_vault()
+
+    if open_mode == "direct":
+        rec.step("open(direct)", open_direct)
+    else:
+        rec.step("open", open_vault)
+    rec.step("scroll", scroll, SCROLL_STEPS)
+    rec.step("add", add, 3)
+    rec.step("save", save)
+    # PasswordManager 没有删除功能，不测 delete
+
+
+def run_tk(path: str, size: int):
+    import ui_test
+    from tkinter import filedialog, simpledialog
+    app = ui_test.VaultApp()
+    app.update()
+
+    def count(w):
+        return 1 + sum(count(c) for c in w.winfo_children())
+
+    rec = Recorder("tk:ui_test", size, app.update, lambda: count(app))
+
+    def open_vault(_):
+        with patched(filedialog, askopenfilename=lambda *a, **k: path), \
+                patched(simpledialog, askstring=lambda *a, **k: PASSWORD):
+            app.open_vault()
+
+    def scroll(i):
+        app.canvas.yview_moveto((i + 1) / SCROLL_STEPS)
+
+    rec.step("open", open_vault)
+    rec.step("scroll", scroll, SCROLL_STEPS)
+    rec.step("add", lambda _: app.test_insert(), 3)
+    rec.step("delete", lambda _: app.test_delete_ten(), 3)
+    app.destroy()
+
+
+@contextlib.contextmanager
+def virtual_display():
+    """
+    Tk 需要 X 显示；已有 DISPLAY 时直接使用，否则尝试启动 Xvfb，都没有则返回 None
+    """
+    if os.environ.get("DISPLAY"):
+        yield os.environ["DISPLAY"]
+        return
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        yield None
+        return
+    display = ":%d" % (99 + os.getpid() % 100)
+    proc = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    try:
+        yield display
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GUI 响应性基准（无界面）")
+    parser.add_argument("--sizes", default="1000,10000", help="逗号分隔的条目数量")
+    parser.add_argument("--gui", default="qt,tk", help="qt、tk 或 qt,tk")
+    parser.add_argument("--qt-module", default="ui", choices=["ui", "main_ui"])
+    parser.add_argument("--qt-open", default="dialog", choices=["dialog", "direct"],
+                        help="dialog 走 open_vault 原流程；direct 直接加载条目并刷新一次")
+    parser.add_argument("--timeout", type=float, default=600, help="单个场景的超时时间（秒）")
+    parser.add_argument("--child", nargs=3, metavar=("GUI", "VAULT", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        gui, path, size = args.child
+        if gui == "qt":
+            run_qt(path, int(size), args.qt_module, args.qt_open)
+        else:
+            run_tk(path, int(size))
+        return
+
+    guis = [g.strip() for g in args.gui.split(",") if g.strip()]
+    with tempfile.TemporaryDirectory() as tmp, virtual_display() as display:
+        for size in (int(s) for s in args.sizes.split(",")):
+            path = os.path.join(tmp, f"bench_{size}.json")
+            make_vault(path, size)
+            for gui in guis:
+                env = dict(os.environ)
+                if gui == "tk":
+                    if display is None:
+                        print(json.dumps({"gui": "tk", "size": size, "skipped": "没有 DISPLAY 或 Xvfb"}, ensure_ascii=False), flush=True)
+                        continue
+                    env["DISPLAY"] = display
+                # 每个场景单独进程，保证 RSS 互不影响，卡死时可超时
+                cmd = [sys.executable, os.path.abspath(__file__), "--qt-module", args.qt_module,
+                       "--qt-open", args.qt_open, "--child", gui, path, str(size)]
+                try:
+                    subprocess.run(cmd, env=env, timeout=args.timeout, check=False)
+                except subprocess.TimeoutExpired:
+                    print(json.dumps({"gui": gui, "size": size, "timeout_s": args.timeout}, ensure_ascii=False), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import mmap
+import json
+import hmac
+import base64
+import struct
+import hashlib
+import tempfile
+from typing import Optional
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from vault import derive_key, subkey, read_vault_header, _wipe
+
+MAGIC = b"MAIDX002"
+SLOT = struct.Struct(">32sQI")  # HMAC(name)、记录偏移、记录长度
+
+
+class StaleIndexError(Exception):
+    """索引不存在或与当前 Vault 不一致，需要回退到完整解密"""
+
+
+def index_path(vault_path: str) -> str:
+    return vault_path + ".idx"
+
+
+def _keys(vault_key) -> tuple:
+    return AESGCM(subkey(vault_key, b"index-enc")), subkey(vault_key, b"index-mac")
+
+
+def _tag(mac_key: bytes, name: str) -> bytes:
+    return hmac.new(mac_key, name.encode(), hashlib.sha256).digest()
+
+
+def _header(count: int, digest: str) -> bytes:
+    return json.dumps({"count": count, "slots": digest.ljust(64, "0")}).encode()
+
+
+def write_index(vault_path: str, vault_key, vault_json: dict, data: dict):
+    """
+    为刚写入的 Vault 生成盲索引：
+
+    MAGIC | Vault nonce | 头长度 | 加密头（条目数、槽位表 SHA-256）| 按标签排序的槽位 | 加密记录
+
+    Vault nonce 明文存放（Vault 文件中本就公开），查找前无需 KDF 即可判断索引是否过期，
+    并作为加密头的 AAD，防止旧索引被拼接到新 Vault 上。
+
+    标签为 HMAC(name)，不泄露名称；每条记录以标签为 AAD 单独加密，
+    重名条目只索引第一条，与按列表顺序查找的结果一致。
+    槽位表的摘要封装在加密头中，删除或改写槽位都能被发现。
+    """
+    aead, mac_key = _keys(vault_key)
+    tagged = {}
+    for entry in data.get("entries", []):
+        name = entry.get("name")
+        if isinstance(name, str):
+            tagged.setdefault(_tag(mac_key, name), entry)
+    tags = sorted(tagged)
+
+    records = []
+    for tag in tags:
+        nonce = os.urandom(12)
+        records.append(nonce + aead.encrypt(nonce, json.dumps(tagged[tag]).encode(), tag))
+
+    preamble = MAGIC + base64.b64decode(vault_json["nonce"])
+    # 加密头长度只取决于条目数的位数，先按占位摘要算出槽位表的起点
+    header_len = 12 + len(_header(len(tags), "")) + 16
+    offset = len(preamble) + 4 + header_len + SLOT.size * len(tags)
+    slots = bytearray()
+    for tag, record in zip(tags, records):
+        slots += SLOT.pack(tag, offset, len(record))
+        offset += len(record)
+    nonce = os.urandom(12)
+    header = nonce + aead.encrypt(nonce, _header(len(tags), hashlib.sha256(slots).hexdigest()), preamble)
+
+    dir_name = os.path.dirname(vault_path) or '.'
+    with tempfile.NamedTemporaryFile('wb', dir=dir_name, delete=False) as tf:
+        tf.write(preamble + struct.pack(">I", len(header)) + header)
+        tf.write(slots)
+        for record in records:
+            tf.write(record)
+        tf.flush()
+        os.fsync(tf.fileno())
+    os.replace(tf.name, index_path(vault_path))
+
+
+def lookup(vault_path: str, password: str, name: str) -> Optional[dict]:
+    """
+    通过盲索引查找单个条目，只解密索引头和一条记录，开销与 Vault 大小基本无关
+
+    未找到返回 None；索引缺失、过期、损坏或无法用该密码解开时抛出 StaleIndexError，
+    由调用方回退到完整解密（密码错误由完整解密报告）
+    """
+    path = index_path(vault_path)
+    if not os.path.exists(path):
+        raise StaleIndexError(path)
+    vault_header = read_vault_header(vault_path)
+    if "nonce" not in vault_header:
+        # 旧格式 Vault 没有对应的索引
+        raise StaleIndexError(path)
+    preamble = MAGIC + base64.b64decode(vault_header["nonce"])
+    start = len(preamble) + 4
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < start:
+            raise StaleIndexError(path)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(preamble)] != preamble:
+                raise StaleIndexError(path)
+            header_len, = struct.unpack(">I", mm[len(preamble):start])
+            base = start + header_len
+            if header_len < 12 + 16 or base > size:
+                raise StaleIndexError(path)
+            key = bytearray(derive_key(password, base64.b64decode(vault_header["salt"])))
+            try:
+                aead, mac_key = _keys(key)
+            finally:
+                _wipe(key)
+            header = mm[start:base]
+            try:
+                header = json.loads(aead.decrypt(header[:12], header[12:], preamble))
+            except InvalidTag:
+                raise StaleIndexError(path)
+
+            count = header["count"]
+            end = base + count * SLOT.size
+            if end > size or hashlib.sha256(mm[base:end]).hexdigest() != header["slots"]:
+                raise StaleIndexError(path)
+            tag = _tag(mac_key, name)
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if mm[base + mid * SLOT.size:base + mid * SLOT.size + 32] < tag:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == count:
+                return None
+            slot_tag, offset, length = SLOT.unpack_from(mm, base + lo * SLOT.size)
+            if slot_tag != tag:
+                return None
+            if offset < end or offset + length > size:
+                raise StaleIndexError(path)
+            record = mm[offset:offset + length]
+    try:
+        entry = json.loads(aead.decrypt(record[:12], record[12:], tag))
+    except InvalidTag:
+        raise StaleIndexError(path)
+    return entry if entry.get("name") == name else None
@@ -1,19 +1,107 @@
 ## cli.py
+import os
 import json
 import typer
 from typing import Optional
-from vault import encrypt_vault, decrypt_vault, atomic_write, load_vault_file
+from vault import (CURRENT_FORMAT, decrypt_vault, derive_key, encrypt_with_key,
+                   atomic_write, load_vault_file, sniff_format, _wipe)
 from argon2.exceptions import VerifyMismatchError
+from audit import BreachCorpus, audit_entries, build_corpus
+from history import History, history_dir
+from attachments import BlobStore, blob_dir, blob_refs
+from blind_index import StaleIndexError, lookup, write_index
 
 app = typer.Typer(help="简单的加密 Vault 管理工具")
 
+FIELDS = ["name", "username", "account", "password", "website", "phone", "email"]
+FORMATS = ("jsonl", "tsv")
+
+
+def _unlock(file: str) -> dict:
+    """提示主密码并解密 Vault，失败时退出；提示和错误都写到 stderr，stdout 只有数据"""
+    pw = typer.prompt("输入主密码", hide_input=True, err=True)
+    try:
+        return decrypt_vault(pw, load_vault_file(file))
+    except ValueError as e:
+        typer.secho(str(e), fg="red", err=True)
+        raise typer.Exit(code=1)
+
+
+def _save(file: str, pw: str, data: dict):
+    """
+    加密写入 Vault，同时重建盲索引并记录历史快照
+
+    Vault 与索引共用一次派生的密钥；历史存储使用自己的 salt（见 store_key），
+    记录快照时会再执行一次 Argon2
+    """
+    salt = os.urandom(16)
+    key = bytearray(derive_key(pw, salt))
+    try:
+        encrypted = encrypt_with_key(key, salt, data)
+        atomic_write(file, encrypted)
+        write_index(file, key, encrypted, data)
+    finally:
+        _wipe(key)
+    _record(file, pw, data)
+
+
+def _record(file: str, pw: str, data: dict):
+    """写入 Vault 后记录历史快照；失败只提示，不影响已完成的写入"""
+    try:
+        History(file, pw).snapshot(data)
+    except (OSError, ValueError) as e:
+        typer.secho(f"未能记录历史快照：{e}", fg="yellow")
+
+
+def _require_history(file: str):
+    if not os.path.isdir(history_dir(file)):
+        typer.secho(f"没有历史记录：{file}", fg="yellow")
+        raise typer.Exit(code=1)
+
+
+def _open_history(file: str, pw: str) -> History:
+    try:
+        return History(file, pw)
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+
+
+def _tsv_cell(value) -> str:
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        typer.secho(f"不支持的格式：{fmt}（可选 {'/'.join(FORMATS)}）", fg="red", err=True)
+        raise typer.Exit(code=1)
+
+
+def _emit(entries, fields: Optional[list], fmt: str):
+    """逐条写出条目，不构建完整的输出字符串"""
+    out = typer.get_text_stream("stdout")
+    if fmt == "tsv":
+        cols = fields or FIELDS
+        out.write("\t".join(cols) + "\n")
+        for entry in entries:
+            out.write("\t".join(_tsv_cell(entry.get(c)) for c in cols) + "\n")
+    else:
+        for entry in entries:
+            if fields:
+                entry = {f: entry[f] for f in fields if f in entry}
+            out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    out.flush()
+
 @app.command()
 def init(file: str):
     """初始化 Vault 文件"""
     pw = typer.prompt("设置主密码", hide_input=True, confirmation_prompt=True)
     empty = {"entries": []}
-    encrypted = encrypt_vault(pw, empty)
-    atomic_write(file, encrypted)
+    _save(file, pw, empty)
     typer.secho(f"已初始化 Vault：{file}", fg="green")
 
 @app.command()
@@ -30,6 +118,49 @@ def show(
         raise typer.Exit(code=1)
     typer.echo(json.dumps(data, indent=2, ensure_ascii=False))
 
+@app.command()
+def get(
+    file: str,
+    name: str,
+    field: Optional[str] = typer.Option(None, help="只输出该字段的值，如 password"),
+    format: str = typer.Option("jsonl", "--format", help="输出格式：jsonl 或 tsv")
+):
+    """按名称查找单个条目：优先走盲索引只解密一条记录，索引过期时回退到完整解密"""
+    _check_format(format)
+    pw = typer.prompt("输入主密码", hide_input=True, err=True)
+    try:
+        try:
+            entry = lookup(file, pw, name)
+        except StaleIndexError:
+            data = decrypt_vault(pw, load_vault_file(file))
+            entry = next((e for e in data.get("entries", []) if e.get("name") == name), None)
+    except ValueError as e:
+        typer.secho(str(e), fg="red", err=True)
+        raise typer.Exit(code=1)
+    if entry is None:
+        typer.secho(f"未找到条目：{name}", fg="yellow", err=True)
+        raise typer.Exit(code=1)
+    if field is None:
+        _emit([entry], None, format)
+    elif field in entry:
+        value = entry[field]
+        typer.echo(value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+    else:
+        typer.secho(f"条目 {name} 没有字段：{field}", fg="yellow", err=True)
+        raise typer.Exit(code=1)
+
+@app.command("list")
+def list_entries(
+    file: str,
+    fields: Optional[str] = typer.Option(None, help="逗号分隔的字段列表，如 name,username"),
+    format: str = typer.Option("jsonl", "--format", help="输出格式：jsonl 或 tsv")
+):
+    """逐条列出条目，可只输出指定字段"""
+    _check_format(format)
+    data = _unlock(file)
+    cols = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    _emit(data.get("entries", []), cols, format)
+
 @app.command()
 def add(
     file: str,
@@ -54,8 +185,7 @@ def add(
         if val is not None:
             entry[key] = val
     data["entries"].append(entry)
-    new_vault = encrypt_vault(pw, data)
-    atomic_write(file, new_vault)
+    _save(file, pw, data)
     typer.secho(f"已添加条目：{name}", fg="green")
 
 @app.command()
@@ -75,8 +205,7 @@ def delete(file: str, name: str):
         typer.secho(f"未找到条目：{name}", fg="yellow")
         raise typer.Exit(code=1)
     data["entries"] = filtered
-    new_vault = encrypt_vault(pw, data)
-    atomic_write(file, new_vault)
+    _save(file, pw, data)
     typer.secho(f"已删除条目：{name}", fg="green")
 
 @app.command()
@@ -108,9 +237,243 @@ def update(
     else:
         typer.secho(f"未找到条目：{name}", fg="yellow")
         raise typer.Exit(code=1)
-    new_vault = encrypt_vault(pw, data)
-    atomic_write(file, new_vault)
+    _save(file, pw, data)
     typer.secho(f"已更新条目：{name}", fg="green")
 
+def _find_entry(data: dict, name: str) -> dict:
+    entry = next((e for e in data.get("entries", []) if e.get("name") == name), None)
+    if entry is None:
+        typer.secho(f"未找到条目：{name}", fg="yellow")
+        raise typer.Exit(code=1)
+    return entry
+
+@app.command()
+def attach(
+    file: str,
+    name: str,
+    path: str,
+    label: Optional[str] = typer.Option(None, "--as", help="附件名称，缺省为文件名")
+):
+    """为条目添加附件（如 SSH 密钥、证书），附件加密后单独存储"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        data = decrypt_vault(pw, load_vault_file(file))
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    entry = _find_entry(data, name)
+    try:
+        ref = BlobStore(file, pw).put(path)
+    except (OSError, ValueError) as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    label = label or os.path.basename(path)
+    refs = [a for a in entry.get("attachments", []) if a.get("name") != label]
+    refs.append({"name": label, **ref})
+    entry["attachments"] = refs
+    _save(file, pw, data)
+    typer.secho(f"已添加附件：{name}/{label}", fg="green")
+
+@app.command()
+def extract(file: str, name: str, attachment: str, out: str):
+    """将条目的附件解密保存到文件"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        data = decrypt_vault(pw, load_vault_file(file))
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    entry = _find_entry(data, name)
+    ref = next((a for a in entry.get("attachments", []) if a.get("name") == attachment), None)
+    if ref is None:
+        typer.secho(f"条目 {name} 没有附件：{attachment}", fg="yellow")
+        raise typer.Exit(code=1)
+    try:
+        BlobStore(file, pw).extract(ref["blob"], out)
+    except (OSError, ValueError) as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    typer.secho(f"已导出附件：{out}", fg="green")
+
+@app.command()
+def detach(file: str, name: str, attachment: str):
+    """移除条目的附件引用；数据在不再被 Vault 和保留的快照引用后由 prune 回收"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        data = decrypt_vault(pw, load_vault_file(file))
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    entry = _find_entry(data, name)
+    refs = entry.get("attachments", [])
+    kept = [a for a in refs if a.get("name") != attachment]
+    if len(kept) == len(refs):
+        typer.secho(f"条目 {name} 没有附件：{attachment}", fg="yellow")
+        raise typer.Exit(code=1)
+    if kept:
+        entry["attachments"] = kept
+    else:
+        del entry["attachments"]
+    _save(file, pw, data)
+    typer.secho(f"已移除附件：{name}/{attachment}", fg="green")
+
+@app.command()
+def history(file: str):
+    """列出 Vault 的历史快照"""
+    _require_history(file)
+    h = _open_history(file, typer.prompt("输入主密码", hide_input=True))
+    for sid, manifest in h.snapshots():
+        typer.echo(f"{sid}\t{manifest['time']}\t{manifest['count']} 条")
+
+@app.command()
+def diff(
+    file: str,
+    old: str,
+    new: Optional[str] = typer.Argument(None, help="另一个快照 ID，缺省为当前 Vault")
+):
+    """比较两个快照（或快照与当前 Vault）的条目差异"""
+    _require_history(file)
+    pw = typer.prompt("输入主密码", hide_input=True)
+    h = _open_history(file, pw)
+    try:
+        target = new if new is not None else decrypt_vault(pw, load_vault_file(file))
+        changes = h.diff(old, target)
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    for name in changes["added"]:
+        typer.secho(f"+ {name}", fg="green")
+    for name in changes["removed"]:
+        typer.secho(f"- {name}", fg="red")
+    for name in changes["changed"]:
+        typer.secho(f"~ {name}", fg="yellow")
+
+@app.command()
+def restore(file: str, snapshot: str):
+    """将 Vault 恢复到指定快照，恢复前的状态同样保留在历史中"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        current = decrypt_vault(pw, load_vault_file(file))
+        h = History(file, pw)
+        h.snapshot(current)
+        data = h.load(snapshot)
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    _save(file, pw, data)
+    typer.secho(f"已恢复到快照：{snapshot}", fg="green")
+
+@app.command()
+def prune(
+    file: str,
+    keep: Optional[int] = typer.Option(50, help="保留最新的快照个数"),
+    days: Optional[int] = typer.Option(None, help="另外保留最近若干天内的快照")
+):
+    """按保留策略删除旧快照，并回收不再被引用的历史对象和附件数据"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        # 当前 Vault 必须能解密，否则无法确定哪些附件仍在使用
+        live = blob_refs(decrypt_vault(pw, load_vault_file(file)))
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    snaps = objects = blobs = 0
+    if os.path.isdir(history_dir(file)):
+        h = _open_history(file, pw)
+        snaps, objects = h.prune(keep, days)
+        live |= h.blob_refs()
+    if os.path.isdir(blob_dir(file)):
+        try:
+            blobs = BlobStore(file, pw).collect(live)
+        except ValueError as e:
+            typer.secho(str(e), fg="red")
+            raise typer.Exit(code=1)
+    typer.secho(f"已删除 {snaps} 个快照、{objects} 个对象、{blobs} 个附件", fg="green")
+
+@app.command()
+def migrate(
+    directory: str,
+    recursive: bool = typer.Option(False, "--recursive", "-r", help="同时处理子目录")
+):
+    """将目录中的旧格式 Vault 批量升级为当前格式（只读取文件头判断格式）"""
+    if recursive:
+        paths = [os.path.join(root, f) for root, _, files in os.walk(directory) for f in files]
+    else:
+        paths = [e.path for e in os.scandir(directory) if e.is_file()]
+    legacy = []
+    for path in sorted(paths):
+        try:
+            fmt = sniff_format(path)
+        except (OSError, ValueError):
+            continue
+        if fmt != CURRENT_FORMAT:
+            legacy.append((path, fmt))
+    if not legacy:
+        typer.secho("没有需要升级的 Vault", fg="green")
+        return
+    pw = typer.prompt("输入主密码", hide_input=True)
+    failed = 0
+    for path, fmt in legacy:
+        try:
+            data = decrypt_vault(pw, load_vault_file(path))
+        except ValueError as e:
+            typer.secho(f"跳过 {path}：{e}", fg="yellow")
+            failed += 1
+            continue
+        try:
+            _save(path, pw, data)
+        except OSError as e:
+            typer.secho(f"跳过 {path}：{e}", fg="yellow")
+            failed += 1
+            continue
+        typer.secho(f"已升级 {path}（{fmt} → {CURRENT_FORMAT}）", fg="green")
+    if failed:
+        raise typer.Exit(code=1)
+
+@app.command()
+def audit(
+    file: str,
+    corpus: Optional[str] = typer.Option(None, help="已排序的二进制 SHA-1 泄露语料（见 corpus 命令）"),
+    min_length: int = typer.Option(12, help="弱密码的最小长度")
+):
+    """检查泄露、复用和弱密码"""
+    pw = typer.prompt("输入主密码", hide_input=True)
+    try:
+        vault = load_vault_file(file)
+        data = decrypt_vault(pw, vault)
+    except ValueError as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    entries = data.get("entries", [])
+    if corpus:
+        try:
+            with BreachCorpus(corpus) as c:
+                report = audit_entries(entries, c, min_length)
+        except (OSError, ValueError) as e:
+            typer.secho(str(e), fg="red")
+            raise typer.Exit(code=1)
+    else:
+        report = audit_entries(entries, None, min_length)
+    for name in report["breached"]:
+        typer.secho(f"[泄露] {name}", fg="red")
+    for names in report["reused"]:
+        typer.secho(f"[复用] {', '.join(names)}", fg="yellow")
+    for name, reasons in report["weak"]:
+        typer.secho(f"[弱密码] {name}: {'；'.join(reasons)}", fg="yellow")
+    if not any(report.values()):
+        typer.secho("未发现问题", fg="green")
+    elif report["breached"]:
+        raise typer.Exit(code=2)
+
+@app.command()
+def corpus(src: str, dst: str):
+    """将 HIBP 的 SHA-1 文本（按哈希排序）转换为二进制语料"""
+    try:
+        n = build_corpus(src, dst)
+    except (OSError, ValueError) as e:
+        typer.secho(str(e), fg="red")
+        raise typer.Exit(code=1)
+    typer.secho(f"已写入 {n} 条记录：{dst}", fg="green")
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,315 @@
+import os
+import json
+import hmac
+import struct
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+from typing import Optional
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from vault import store_key, subkey, _wipe
+
+SNAPSHOT_FORMAT = "%Y%m%d-%H%M%S-%f"
+PAGE_MASK = 0x3f  # 条目 ID 首字节与掩码为 0 时切页，平均每页 64 条
+PACK_MAGIC = b"MAHPACK1"
+PACK_ENTRY = struct.Struct(">32sQI")  # 对象 ID、偏移、长度
+PACK_FOOTER = struct.Struct(">I8s")   # 对象数、MAGIC
+
+
+def history_dir(vault_path: str) -> str:
+    return vault_path + ".history"
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _write_bytes(path: str, content: bytes):
+    """
+    原子化写入二进制文件
+    """
+    dir_name = os.path.dirname(path)
+    os.makedirs(dir_name, exist_ok=True)
+    with tempfile.NamedTemporaryFile('wb', dir=dir_name, delete=False) as tf:
+        tf.write(content)
+        tf.flush()
+        os.fsync(tf.fileno())
+    os.replace(tf.name, path)
+
+
+def _write_pack(path: str, records: list):
+    """
+    将 [(对象 ID, 密文)] 写成一个包文件，只 fsync 一次：
+
+    密文依次拼接 | 索引（对象 ID、偏移、长度）| 对象数 | MAGIC
+    """
+    dir_name = os.path.dirname(path)
+    os.makedirs(dir_name, exist_ok=True)
+    table = bytearray()
+    offset = 0
+    with tempfile.NamedTemporaryFile('wb', dir=dir_name, delete=False) as tf:
+        for oid, blob in records:
+            tf.write(blob)
+            table += PACK_ENTRY.pack(bytes.fromhex(oid), offset, len(blob))
+            offset += len(blob)
+        tf.write(table)
+        tf.write(PACK_FOOTER.pack(len(records), PACK_MAGIC))
+        tf.flush()
+        os.fsync(tf.fileno())
+    os.replace(tf.name, path)
+
+
+def _read_pack_index(path: str) -> list:
+    """
+    读取包文件末尾的索引，返回 [(对象 ID, 偏移, 长度)]
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if size < PACK_FOOTER.size:
+            raise ValueError(f"历史数据包已损坏: {path}")
+        f.seek(size - PACK_FOOTER.size)
+        count, magic = PACK_FOOTER.unpack(f.read(PACK_FOOTER.size))
+        table_size = count * PACK_ENTRY.size
+        if magic != PACK_MAGIC or table_size > size - PACK_FOOTER.size:
+            raise ValueError(f"历史数据包已损坏: {path}")
+        f.seek(size - PACK_FOOTER.size - table_size)
+        table = f.read(table_size)
+    return [(oid.hex(), offset, length) for oid, offset, length in PACK_ENTRY.iter_unpack(table)]
+
+
+class History:
+    """
+    Vault 的加密快照历史
+
+    每个条目加密后以 HMAC(内容) 为 ID 存为一个对象，未变化的条目在各快照间只存一份；
+    条目 ID 列表按内容定义的边界切成页，页同样去重，快照清单只记录页 ID，
+    因此每次快照新增的存储只与改动的条目数量成正比。
+    一次快照新增的对象写入同一个包文件，只需一次 fsync。
+    """
+
+    def __init__(self, vault_path: str, password: str):
+        self.root = history_dir(vault_path)
+        key = store_key(self.root, password)
+        try:
+            self._aead = AESGCM(subkey(key, b"history-enc"))
+            self._mac_key = subkey(key, b"history-mac")
+        finally:
+            _wipe(key)
+        self._packs = os.path.join(self.root, "packs")
+        self._snapshots = os.path.join(self.root, "snapshots")
+        self._index = None    # 对象 ID -> (包文件名, 偏移, 长度)，首次使用时加载
+        self._pending = {}    # 本次快照新增、尚未写入包文件的对象
+
+    # —— 对象存储 ——
+    def _mac(self, content: bytes) -> str:
+        return hmac.new(self._mac_key, content, hashlib.sha256).hexdigest()
+
+    def _pack_names(self) -> list:
+        if not os.path.isdir(self._packs):
+            return []
+        return sorted(n for n in os.listdir(self._packs) if n.endswith(".pack"))
+
+    def _objects(self) -> dict:
+        if self._index is None:
+            self._index = {}
+            for name in self._pack_names():
+                for oid, offset, length in _read_pack_index(os.path.join(self._packs, name)):
+                    self._index[oid] = (name, offset, length)
+        return self._index
+
+    def _put(self, oid: str, content: bytes):
+        if oid not in self._pending and oid not in self._objects():
+            nonce = os.urandom(12)
+            self._pending[oid] = nonce + self._aead.encrypt(nonce, content, oid.encode())
+
+    def _flush(self, name: str):
+        """
+        将待写入的对象写成包文件 name.pack
+        """
+        if not self._pending:
+            return
+        pack = name + ".pack"
+        records = list(self._pending.items())
+        _write_pack(os.path.join(self._packs, pack), records)
+        offset = 0
+        for oid, blob in records:
+            self._index[oid] = (pack, offset, len(blob))
+            offset += len(blob)
+        self._pending = {}
+
+    def _get(self, oid: str):
+        blob = self._pending.get(oid)
+        if blob is None:
+            if oid not in self._objects():
+                raise ValueError(f"历史对象缺失: {oid}")
+            name, offset, length = self._index[oid]
+            with open(os.path.join(self._packs, name), 'rb') as f:
+                f.seek(offset)
+                blob = f.read(length)
+        return json.loads(self._aead.decrypt(blob[:12], blob[12:], oid.encode()))
+
+    # —— 快照清单 ——
+    def snapshot_ids(self) -> list:
+        if not os.path.isdir(self._snapshots):
+            return []
+        return sorted(os.listdir(self._snapshots))
+
+    def manifest(self, sid: str) -> dict:
+        path = os.path.join(self._snapshots, sid)
+        if not os.path.exists(path):
+            raise ValueError(f"找不到快照: {sid}")
+        with open(path, 'rb') as f:
+            blob = f.read()
+        return json.loads(self._aead.decrypt(blob[:12], blob[12:], sid.encode()))
+
+    def snapshots(self) -> list:
+        """
+        按时间顺序返回 [(快照 ID, 清单)]
+        """
+        return [(sid, self.manifest(sid)) for sid in self.snapshot_ids()]
+
+    def _entry_ids(self, manifest: dict) -> list:
+        ids = []
+        for pid in manifest["pages"]:
+            ids.extend(self._get(pid))
+        return ids
+
+    def _put_page(self, page: list, known: set) -> str:
+        """
+        存储一页条目 ID 列表；已被上一快照引用的页无需再检查其中的条目
+        """
+        listing = _encode([oid for oid, _ in page])
+        pid = self._mac(listing)
+        if pid not in known:
+            for oid, content in page:
+                self._put(oid, content)
+            self._put(pid, listing)
+        return pid
+
+    def snapshot(self, data: dict) -> Optional[str]:
+        """
+        记录一次快照，返回快照 ID；与最新快照内容相同时不记录，返回 None
+        """
+        sids = self.snapshot_ids()
+        prev = self.manifest(sids[-1]) if sids else None
+        prev_pages = set(prev["pages"]) if prev else set()
+
+        entries = data.get("entries", [])
+        meta = _encode({k: v for k, v in data.items() if k != "entries"})
+        meta_id = self._mac(meta)
+        self._put(meta_id, meta)
+
+        pages = []
+        page = []
+        for entry in entries:
+            content = _encode(entry)
+            page.append((self._mac(content), content))
+            if int(page[-1][0][:2], 16) & PAGE_MASK == 0:
+                pages.append(self._put_page(page, prev_pages))
+                page = []
+        if page:
+            pages.append(self._put_page(page, prev_pages))
+
+        if prev and prev["pages"] == pages and prev["meta"] == meta_id:
+            self._pending = {}
+            return None
+        now = datetime.now()
+        sid = now.strftime(SNAPSHOT_FORMAT)
+        # 先写包文件再写清单，中断时只会留下未被引用的包，由 prune 回收
+        self._flush(sid)
+        manifest = _encode({
+            "time": now.isoformat(timespec="seconds"),
+            "count": len(entries),
+            "meta": meta_id,
+            "pages": pages
+        })
+        nonce = os.urandom(12)
+        _write_bytes(os.path.join(self._snapshots, sid),
+                     nonce + self._aead.encrypt(nonce, manifest, sid.encode()))
+        return sid
+
+    def load(self, sid: str) -> dict:
+        """
+        还原指定快照的完整明文数据
+        """
+        manifest = self.manifest(sid)
+        data = self._get(manifest["meta"])
+        data["entries"] = [self._get(oid) for oid in self._entry_ids(manifest)]
+        return data
+
+    def diff(self, old, new) -> dict:
+        """
+        比较两个快照（快照 ID 或明文 dict），按条目名称返回新增/删除/修改；
+        只解密两侧不同的条目
+        """
+        def id_map(source) -> dict:
+            if isinstance(source, str):
+                return dict.fromkeys(self._entry_ids(self.manifest(source)))
+            return {self._mac(_encode(e)): e for e in source.get("entries", [])}
+
+        def names(mapping: dict, ids) -> set:
+            return {(mapping[oid] or self._get(oid)).get("name", "<Unnamed>") for oid in ids}
+
+        a, b = id_map(old), id_map(new)
+        gone = names(a, a.keys() - b.keys())
+        came = names(b, b.keys() - a.keys())
+        return {
+            "added": sorted(came - gone),
+            "removed": sorted(gone - came),
+            "changed": sorted(gone & came)
+        }
+
+    def blob_refs(self) -> set:
+        """
+        返回所有快照中条目引用的附件 ID；每个不同的条目对象只解密一次
+        """
+        oids = set()
+        for sid in self.snapshot_ids():
+            oids.update(self._entry_ids(self.manifest(sid)))
+        refs = set()
+        for oid in oids:
+            for a in self._get(oid).get("attachments", []):
+                if "blob" in a:
+                    refs.add(a["blob"])
+        return refs
+
+    def prune(self, keep: Optional[int] = None, days: Optional[int] = None) -> tuple:
+        """
+        按保留策略删除旧快照：保留最新的 keep 个以及 days 天内的快照，
+        最新快照总是保留；随后回收不再被引用的对象。返回 (删除的快照数, 删除的对象数)
+        """
+        sids = self.snapshot_ids()
+        if not sids or (keep is None and days is None):
+            return 0, 0
+        retain = set(sids[-max(keep or 0, 1):])
+        if days is not None:
+            cutoff = datetime.now() - timedelta(days=days)
+            retain.update(s for s in sids if datetime.strptime(s, SNAPSHOT_FORMAT) >= cutoff)
+        doomed = [s for s in sids if s not in retain]
+        for sid in doomed:
+            os.remove(os.path.join(self._snapshots, sid))
+
+        live = set()
+        for sid in retain:
+            manifest = self.manifest(sid)
+            live.add(manifest["meta"])
+            live.update(manifest["pages"])
+            live.update(self._entry_ids(manifest))
+        removed = 0
+        for name in self._pack_names():
+            path = os.path.join(self._packs, name)
+            index = _read_pack_index(path)
+            kept = [(oid, offset, length) for oid, offset, length in index if oid in live]
+            removed += len(index) - len(kept)
+            if not kept:
+                os.remove(path)
+            elif len(kept) < len(index):
+                # 包内密文以对象 ID 为 AAD，与位置无关，可直接复制重新打包
+                with open(path, 'rb') as f:
+                    records = []
+                    for oid, offset, length in kept:
+                        f.seek(offset)
+                        records.append((oid, f.read(length)))
+                _write_pack(path, records)
+        self._index = None
+        return len(doomed), removed
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import pytest
+from async_vault import AsyncVault
+from vault import encrypt_vault, decrypt_vault, atomic_write, load_vault_file
+
+PASSWORD = "correct horse"
+
+
+def read(path: str) -> dict:
+    return decrypt_vault(PASSWORD, load_vault_file(path))
+
+
+def test_open_during_save_keeps_handle(tmp_path):
+    path = str(tmp_path / "v.json")
+    entries = [{"name": f"n{i}", "password": "x" * 40} for i in range(20000)]
+
+    async def main():
+        async with AsyncVault() as av:
+            data = await av.create(path, PASSWORD, {"entries": entries})
+            data["entries"].append({"name": "first"})
+            save = asyncio.ensure_future(av.save(path))
+            opened = []
+            while not save.done():
+                opened.append(await av.open(path, PASSWORD))
+            await save
+            opened.append(await av.open(path, PASSWORD))
+            assert all(d is data for d in opened)
+            # 保存期间拿到的 dict 仍是缓存对象，再次修改后保存不会丢失
+            data["entries"].append({"name": "second"})
+            await av.save(path)
+
+    asyncio.run(main())
+    assert [e["name"] for e in read(path)["entries"][-2:]] == ["first", "second"]
+
+
+def test_save_refuses_external_change(tmp_path):
+    path = str(tmp_path / "v.json")
+
+    async def main():
+        async with AsyncVault() as av:
+            data = await av.create(path, PASSWORD, {"entries": [{"name": "x"}]})
+            time.sleep(0.01)
+            atomic_write(path, encrypt_vault(PASSWORD, {"entries": [{"name": "outside"}]}))
+            data["entries"].append({"name": "y"})
+            with pytest.raises(ValueError):
+                await av.save(path)
+            # 句柄已淘汰，重新打开得到外部写入的内容
+            assert await av.open(path, PASSWORD) == {"entries": [{"name": "outside"}]}
+
+    asyncio.run(main())
+    assert read(path) == {"entries": [{"name": "outside"}]}
+
+
+def test_ttl_sweep_wipes_idle_handles(tmp_path):
+    path = str(tmp_path / "v.json")
+
+    async def main():
+        async with AsyncVault(ttl=0.2) as av:
+            await av.create(path, PASSWORD)
+            handle = av._handles[path]
+            await asyncio.sleep(0.5)
+            assert not av._handles and not av._locks
+            assert handle.key == bytearray(32) and handle.data is None
+            with pytest.raises(ValueError):
+                await av.save(path)
+
+    asyncio.run(main())
+
+
+def test_wrong_password(tmp_path):
+    path = str(tmp_path / "v.json")
+    atomic_write(path, encrypt_vault(PASSWORD, {"entries": []}))
+
+    async def main():
+        async with AsyncVault() as av:
+            with pytest.raises(ValueError):
+                await av.open(path, "wrong")
+            assert await av.open(path, PASSWORD) == {"entries": []}
+
+    asyncio.run(main())
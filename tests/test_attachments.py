@@ -0,0 +1,96 @@
+import os
+import shutil
+import pytest
+from typer.testing import CliRunner
+from cli import app
+from attachments import BLOB_CHUNK, TAG_SIZE, BlobStore
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "v.json"), PASSWORD)
+
+
+def write(path, content: bytes) -> str:
+    with open(path, "wb") as f:
+        f.write(content)
+    return str(path)
+
+
+def blob_files(store) -> list:
+    return [os.path.join(d, f) for d, _, files in os.walk(store.root) for f in files
+            if d != store.root]
+
+
+@pytest.mark.parametrize("size", [0, 1, BLOB_CHUNK - 1, BLOB_CHUNK, BLOB_CHUNK + 1, 3 * BLOB_CHUNK + 5])
+def test_round_trip(tmp_path, store, size):
+    content = os.urandom(size)
+    ref = store.put(write(tmp_path / "src", content))
+    assert ref["size"] == size
+    store.extract(ref["blob"], str(tmp_path / "out"))
+    assert (tmp_path / "out").read_bytes() == content
+
+
+def test_dedup(tmp_path, store):
+    content = os.urandom(BLOB_CHUNK + 10)
+    a = store.put(write(tmp_path / "a", content))
+    b = store.put(write(tmp_path / "b", content))
+    assert a == b
+    assert len(blob_files(store)) == 1
+    assert store.put(write(tmp_path / "c", b"other"))["blob"] != a["blob"]
+
+
+def test_tampered_blob(tmp_path, store):
+    ref = store.put(write(tmp_path / "src", os.urandom(2 * BLOB_CHUNK)))
+    path, = blob_files(store)
+    data = bytearray(open(path, "rb").read())
+    data[-1] ^= 1
+    write(path, bytes(data))
+    with pytest.raises(ValueError):
+        store.extract(ref["blob"], str(tmp_path / "out"))
+    assert not (tmp_path / "out").exists()
+
+
+@pytest.mark.parametrize("cut", [BLOB_CHUNK + TAG_SIZE, 1])
+def test_truncated_blob(tmp_path, store, cut):
+    ref = store.put(write(tmp_path / "src", os.urandom(2 * BLOB_CHUNK)))
+    path, = blob_files(store)
+    data = open(path, "rb").read()
+    write(path, data[:-cut])
+    with pytest.raises(ValueError):
+        store.extract(ref["blob"], str(tmp_path / "out"))
+
+
+def test_swapped_blob(tmp_path, store):
+    a = store.put(write(tmp_path / "a", b"a" * 100))
+    b = store.put(write(tmp_path / "b", b"b" * 100))
+    shutil.copy(store._path(a["blob"]), store._path(b["blob"]))
+    with pytest.raises(ValueError):
+        store.extract(b["blob"], str(tmp_path / "out"))
+
+
+def test_prune_collects_detached(tmp_path):
+    path = str(tmp_path / "v.json")
+    runner = CliRunner()
+
+    def run(*args):
+        result = runner.invoke(app, list(args), input=PASSWORD + "\n" + PASSWORD + "\n")
+        assert result.exit_code == 0, result.output
+
+    run("init", path)
+    run("add", path, "--name", "gh")
+    run("attach", path, "gh", write(tmp_path / "key", b"ssh key"))
+    run("attach", path, "gh", write(tmp_path / "codes", b"recovery codes"))
+    store = BlobStore(path, PASSWORD)
+    assert len(blob_files(store)) == 2
+
+    run("detach", path, "gh", "codes")
+    run("prune", path)
+    # 仍被历史快照引用
+    assert len(blob_files(store)) == 2
+    run("prune", path, "--keep", "1")
+    assert len(blob_files(store)) == 1
+    run("extract", path, "gh", "key", str(tmp_path / "out"))
+    assert (tmp_path / "out").read_bytes() == b"ssh key"
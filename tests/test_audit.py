@@ -0,0 +1,70 @@
+import os
+import random
+import pytest
+from audit import RECORD_SIZE, BreachCorpus, audit_entries, build_corpus, sha1_digest
+
+
+def write_corpus(tmp_path, digests) -> str:
+    src = tmp_path / "hibp.txt"
+    src.write_text("".join(f"{d.hex().upper()}:{i + 1}\n" for i, d in enumerate(sorted(digests))))
+    dst = str(tmp_path / "corpus.bin")
+    build_corpus(str(src), dst)
+    return dst
+
+
+def test_build_corpus(tmp_path):
+    digests = [os.urandom(RECORD_SIZE) for _ in range(100)]
+    src = tmp_path / "hibp.txt"
+    lines = [f"{d.hex().upper()}:{i}" for i, d in enumerate(sorted(digests))]
+    # 空行与重复记录被忽略
+    src.write_text("\n".join(lines[:50] + ["", lines[49]] + lines[50:]) + "\n")
+    dst = tmp_path / "corpus.bin"
+    assert build_corpus(str(src), str(dst)) == 100
+    assert dst.read_bytes() == b"".join(sorted(digests))
+
+
+def test_build_corpus_rejects_unsorted(tmp_path):
+    a, b = sorted(os.urandom(RECORD_SIZE) for _ in range(2))
+    src = tmp_path / "hibp.txt"
+    src.write_text(f"{b.hex()}:1\n{a.hex()}:1\n")
+    with pytest.raises(ValueError):
+        build_corpus(str(src), str(tmp_path / "corpus.bin"))
+
+
+def test_contains_many(tmp_path):
+    rng = random.Random(0)
+    present = {rng.randbytes(RECORD_SIZE) for _ in range(5000)}
+    absent = {rng.randbytes(RECORD_SIZE) for _ in range(5000)} - present
+    edges = sorted(present)
+    # 包含首尾记录以及小于/大于全部记录的查询
+    queries = set(rng.sample(sorted(present), 300)) | set(rng.sample(sorted(absent), 300))
+    queries |= {edges[0], edges[-1], b"\x00" * RECORD_SIZE, b"\xff" * RECORD_SIZE}
+    with BreachCorpus(write_corpus(tmp_path, present)) as corpus:
+        assert corpus.count == len(present)
+        assert corpus.contains_many(queries) == queries & present
+        assert corpus.contains_many([]) == set()
+        assert edges[-1] in corpus
+        assert b"\xff" * RECORD_SIZE not in corpus
+
+
+def test_empty_corpus(tmp_path):
+    path = tmp_path / "corpus.bin"
+    path.write_bytes(b"")
+    with BreachCorpus(str(path)) as corpus:
+        assert corpus.contains_many([sha1_digest("password")]) == set()
+
+
+def test_audit_entries(tmp_path):
+    entries = [
+        {"name": "mail", "password": "password"},
+        {"name": "mail", "password": "hunter2"},
+        {"name": "bank", "password": "hunter2"},
+        {"name": "ok", "password": "Xk4!pz9#Lm2@qw"},
+        {"name": "empty"},
+    ]
+    with BreachCorpus(write_corpus(tmp_path, [sha1_digest("password")])) as corpus:
+        report = audit_entries(entries, corpus)
+    assert report["breached"] == ["mail"]
+    assert report["reused"] == [["mail", "bank"]]
+    # 重名条目各自报告
+    assert [name for name, _ in report["weak"]] == ["mail", "mail", "bank"]
@@ -0,0 +1,74 @@
+import os
+import struct
+import pytest
+from typer.testing import CliRunner
+from cli import app
+from vault import derive_key, encrypt_with_key, atomic_write
+from blind_index import MAGIC, StaleIndexError, index_path, lookup, write_index
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def vault(tmp_path):
+    path = str(tmp_path / "v.json")
+    data = {"entries": [{"name": f"n{i}", "password": f"p{i}"} for i in range(50)]}
+    salt = os.urandom(16)
+    key = bytearray(derive_key(PASSWORD, salt))
+    encrypted = encrypt_with_key(key, salt, data)
+    atomic_write(path, encrypted)
+    write_index(path, key, encrypted, data)
+    return path
+
+
+def test_lookup(vault):
+    assert lookup(vault, PASSWORD, "n7") == {"name": "n7", "password": "p7"}
+    assert lookup(vault, PASSWORD, "missing") is None
+
+
+def test_wrong_password_is_stale(vault):
+    with pytest.raises(StaleIndexError):
+        lookup(vault, "wrong", "n7")
+
+
+def test_resaved_vault_is_stale(vault):
+    with open(index_path(vault), "rb") as f:
+        index = f.read()
+    salt = os.urandom(16)
+    atomic_write(vault, encrypt_with_key(derive_key(PASSWORD, salt), salt, {"entries": []}))
+    with open(index_path(vault), "wb") as f:
+        f.write(index)
+    with pytest.raises(StaleIndexError):
+        lookup(vault, PASSWORD, "n7")
+
+
+@pytest.mark.parametrize("size", [0, 10, len(MAGIC) + 16, 200])
+def test_truncated_index_is_stale(vault, size):
+    path = index_path(vault)
+    with open(path, "rb") as f:
+        index = f.read()
+    with open(path, "wb") as f:
+        f.write(index[:size])
+    with pytest.raises(StaleIndexError):
+        lookup(vault, PASSWORD, "n7")
+
+
+def test_rewritten_slot_is_stale(vault):
+    path = index_path(vault)
+    with open(path, "rb") as f:
+        index = bytearray(f.read())
+    start = len(MAGIC) + 12
+    header_len, = struct.unpack(">I", index[start:start + 4])
+    slot = start + 4 + header_len
+    index[slot:slot + 32] = b"\xff" * 32
+    with open(path, "wb") as f:
+        f.write(index)
+    with pytest.raises(StaleIndexError):
+        lookup(vault, PASSWORD, "missing")
+
+
+def test_get_falls_back_to_full_decrypt(vault):
+    open(index_path(vault), "wb").close()
+    result = CliRunner().invoke(app, ["get", vault, "n7", "--field", "password"], input=PASSWORD + "\n")
+    assert result.exit_code == 0
+    assert result.output.splitlines()[-1] == "p7"
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+from cli import _save
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+
+PASSWORD = "correct horse"
+ENTRIES = [
+    {"name": "gh", "username": "octo", "password": "p"},
+    {"name": "odd", "username": "a\tb\nc\\d\r", "password": "q", "attachments": [{"name": "k", "blob": "00", "size": 1}]},
+]
+
+
+@pytest.fixture
+def vault(tmp_path):
+    path = str(tmp_path / "v.json")
+    _save(path, PASSWORD, {"entries": ENTRIES})
+    return path
+
+
+def run(*args, password=PASSWORD):
+    # 以子进程运行，按脚本的实际用法分别检查 stdout 与 stderr
+    return subprocess.run([sys.executable, CLI, *args], input=password + "\n",
+                          capture_output=True, text=True)
+
+
+def test_list_jsonl(vault):
+    result = run("list", vault)
+    assert result.returncode == 0
+    assert [json.loads(line) for line in result.stdout.splitlines()] == ENTRIES
+
+
+def test_list_jsonl_fields(vault):
+    result = run("list", vault, "--fields", "name,password")
+    assert [json.loads(line) for line in result.stdout.splitlines()] == [
+        {"name": "gh", "password": "p"}, {"name": "odd", "password": "q"}]
+
+
+def test_list_tsv_escaping(vault):
+    result = run("list", vault, "--fields", "name,username,email,attachments", "--format", "tsv")
+    assert result.returncode == 0
+    assert result.stdout.splitlines() == [
+        "name\tusername\temail\tattachments",
+        "gh\tocto\t\t",
+        'odd\ta\\tb\\nc\\\\d\\r\t\t[{"name": "k", "blob": "00", "size": 1}]',
+    ]
+
+
+def test_get(vault):
+    result = run("get", vault, "odd", "--format", "tsv")
+    assert result.returncode == 0
+    assert result.stdout.splitlines()[1].startswith("odd\ta\\tb\\nc\\\\d\\r\t")
+    assert run("get", vault, "gh", "--field", "password").stdout == "p\n"
+    assert json.loads(run("get", vault, "odd", "--field", "attachments").stdout) == ENTRIES[1]["attachments"]
+
+
+@pytest.mark.parametrize("args,password", [
+    (("get", "gh"), "wrong"),
+    (("get", "missing"), PASSWORD),
+    (("get", "gh", "--field", "email"), PASSWORD),
+    (("list",), "wrong"),
+    (("list", "--format", "csv"), PASSWORD),
+])
+def test_diagnostics_go_to_stderr(vault, args, password):
+    result = run(args[0], vault, *args[1:], password=password)
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert result.stderr.strip()
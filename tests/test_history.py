@@ -0,0 +1,58 @@
+import pytest
+from typer.testing import CliRunner
+from cli import app
+from history import History
+from vault import decrypt_vault, load_vault_file
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def history(tmp_path):
+    return History(str(tmp_path / "v.json"), PASSWORD)
+
+
+def test_snapshot_and_load(history):
+    first = {"entries": [{"name": f"n{i}", "password": f"p{i}"} for i in range(300)]}
+    second = {"entries": first["entries"][1:] + [{"name": "new", "password": "x"}]}
+    second["entries"][5] = {"name": "n6", "password": "changed"}
+    a = history.snapshot(first)
+    b = history.snapshot(second)
+    assert history.snapshot(second) is None
+    assert history.snapshot_ids() == [a, b]
+    assert history.load(a) == first
+    assert history.load(b) == second
+    assert history.diff(a, b) == {"added": ["new"], "removed": ["n0"], "changed": ["n6"]}
+
+
+def test_prune_keeps_latest(history):
+    sids = [history.snapshot({"entries": [{"name": "n", "password": str(i)}]}) for i in range(3)]
+    # 每个被删快照独有一个条目对象和一个页对象
+    assert history.prune(keep=1) == (2, 4)
+    assert history.snapshot_ids() == sids[-1:]
+    assert history.load(sids[-1]) == {"entries": [{"name": "n", "password": "2"}]}
+
+
+def test_wrong_password(tmp_path, history):
+    history.snapshot({"entries": []})
+    with pytest.raises(ValueError):
+        History(str(tmp_path / "v.json"), "wrong")
+
+
+def test_cli_restore(tmp_path):
+    path = str(tmp_path / "v.json")
+    runner = CliRunner()
+    assert runner.invoke(app, ["init", path], input=f"{PASSWORD}\n{PASSWORD}\n").exit_code == 0
+    first = History(path, PASSWORD).snapshot_ids()[-1]
+    assert runner.invoke(app, ["add", path, "--name", "gh"], input=PASSWORD + "\n").exit_code == 0
+    assert runner.invoke(app, ["restore", path, first], input=PASSWORD + "\n").exit_code == 0
+    assert decrypt_vault(PASSWORD, load_vault_file(path)) == {"entries": []}
+    assert len(History(path, PASSWORD).snapshot_ids()) == 3
+
+
+def test_prune_repacks_shared_objects(tmp_path, history):
+    history.snapshot({"entries": [{"name": "x"}, {"name": "y"}]})
+    b = history.snapshot({"entries": [{"name": "x"}, {"name": "z"}]})
+    snaps, objects = history.prune(keep=1)
+    assert snaps == 1 and objects > 0
+    assert History(str(tmp_path / "v.json"), PASSWORD).load(b) == {"entries": [{"name": "x"}, {"name": "z"}]}
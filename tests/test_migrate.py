@@ -0,0 +1,74 @@
+import os
+import json
+import base64
+import pytest
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from typer.testing import CliRunner
+import cli
+from cli import app
+from vault import (CURRENT_FORMAT, LEGACY_FERNET_FORMAT, encrypt_vault, decrypt_vault,
+                   atomic_write, load_vault_file, sniff_format)
+
+PASSWORD = "correct horse"
+ENTRIES = [{"name": "gh", "password": "p"}]
+
+
+def write_fernet(path, password: str, entries: list):
+    """按 ui.py 早期的 save_vault 写出 PBKDF2 + Fernet 文件"""
+    salt = os.urandom(16)
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100_000)
+    key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+    with open(path, "w") as f:
+        json.dump({
+            "salt": base64.b64encode(salt).decode("utf-8"),
+            "data": Fernet(key).encrypt(json.dumps(entries).encode("utf-8")).decode("utf-8")
+        }, f, indent=4)
+
+
+def test_reads_legacy_fernet(tmp_path):
+    path = str(tmp_path / "old.json")
+    write_fernet(path, PASSWORD, ENTRIES)
+    assert sniff_format(path) == LEGACY_FERNET_FORMAT
+    assert decrypt_vault(PASSWORD, load_vault_file(path)) == {"entries": ENTRIES}
+    with pytest.raises(ValueError):
+        decrypt_vault("wrong", load_vault_file(path))
+
+
+def test_migrate(tmp_path):
+    old = str(tmp_path / "old.json")
+    other = str(tmp_path / "other.json")
+    current = str(tmp_path / "current.json")
+    write_fernet(old, PASSWORD, ENTRIES)
+    write_fernet(other, "another password", ENTRIES)
+    atomic_write(current, encrypt_vault(PASSWORD, {"entries": []}))
+    before = os.stat(current).st_mtime_ns
+    (tmp_path / "notes.txt").write_text("not a vault")
+
+    result = CliRunner().invoke(app, ["migrate", str(tmp_path)], input=PASSWORD + "\n")
+    assert result.exit_code == 1
+    assert "跳过" in result.output and "other.json" in result.output
+
+    assert sniff_format(old) == CURRENT_FORMAT
+    assert decrypt_vault(PASSWORD, load_vault_file(old)) == {"entries": ENTRIES}
+    assert sniff_format(other) == LEGACY_FERNET_FORMAT
+    assert os.stat(current).st_mtime_ns == before
+
+
+def test_migrate_skips_unwritable(tmp_path, monkeypatch):
+    paths = [str(tmp_path / f"{n}.json") for n in ("a", "b", "c")]
+    for path in paths:
+        write_fernet(path, PASSWORD, ENTRIES)
+    save = cli._save
+
+    def failing_save(path, pw, data):
+        if path == paths[1]:
+            raise PermissionError(13, "Permission denied", path)
+        save(path, pw, data)
+
+    monkeypatch.setattr(cli, "_save", failing_save)
+    result = CliRunner().invoke(app, ["migrate", str(tmp_path)], input=PASSWORD + "\n")
+    assert result.exit_code == 1
+    assert "跳过" in result.output and "b.json" in result.output
+    assert [sniff_format(p) for p in paths] == [CURRENT_FORMAT, LEGACY_FERNET_FORMAT, CURRENT_FORMAT]
@@ -0,0 +1,101 @@
+import os
+import json
+import base64
+import pytest
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from vault import (CHUNK_SIZE, TAG_SIZE, derive_key, encrypt_vault, decrypt_vault,
+                   atomic_write, load_vault_file, read_vault_header)
+
+PASSWORD = "correct horse"
+OVERHEAD = len(json.dumps({"p": ""}))
+
+
+def padded(size: int) -> dict:
+    """返回 json.dumps 后恰好为 size 字节的数据"""
+    return {"p": "x" * (size - OVERHEAD)}
+
+
+SIZES = [
+    OVERHEAD,
+    OVERHEAD + 1,
+    CHUNK_SIZE - TAG_SIZE - 1,
+    CHUNK_SIZE - TAG_SIZE,
+    CHUNK_SIZE - TAG_SIZE + 1,
+    CHUNK_SIZE - 1,
+    CHUNK_SIZE,
+    CHUNK_SIZE + 1,
+    2 * CHUNK_SIZE,
+    3 * CHUNK_SIZE + 7,
+]
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_round_trip_at_chunk_boundaries(tmp_path, size):
+    data = padded(size)
+    assert len(json.dumps(data)) == size
+    path = str(tmp_path / "v.json")
+    atomic_write(path, encrypt_vault(PASSWORD, data))
+    assert decrypt_vault(PASSWORD, load_vault_file(path)) == data
+
+
+def test_round_trip_empty_and_unicode(tmp_path):
+    path = str(tmp_path / "v.json")
+    for data in ({}, {"entries": []}, {"entries": [{"name": "邮箱", "password": "p\"\\\n\t✓"}]}):
+        atomic_write(path, encrypt_vault(PASSWORD, data))
+        assert decrypt_vault(PASSWORD, load_vault_file(path)) == data
+
+
+def test_reads_baseline_file(tmp_path):
+    """旧版 encrypt_vault 一次性加密、json.dump 写出的文件仍可读取"""
+    data = {"entries": [{"name": f"n{i}", "password": "x" * 50} for i in range(20000)]}
+    salt, nonce = os.urandom(16), os.urandom(12)
+    ct = AESGCM(derive_key(PASSWORD, salt)).encrypt(nonce, json.dumps(data).encode(), None)
+    path = tmp_path / "v.json"
+    with open(path, "w") as f:
+        json.dump({
+            "kdf": "argon2id",
+            "salt": base64.b64encode(salt).decode(),
+            "nonce": base64.b64encode(nonce).decode(),
+            "ciphertext": base64.b64encode(ct).decode()
+        }, f)
+    assert decrypt_vault(PASSWORD, load_vault_file(str(path))) == data
+
+
+def test_atomic_write_matches_json_dump(tmp_path):
+    vault_json = encrypt_vault(PASSWORD, padded(2 * CHUNK_SIZE))
+    path = str(tmp_path / "v.json")
+    atomic_write(path, vault_json)
+    with open(path) as f:
+        assert json.load(f) == vault_json
+    assert read_vault_header(path) == {k: vault_json[k] for k in ("kdf", "salt", "nonce")}
+
+
+def test_compact_json_is_readable(tmp_path):
+    vault_json = encrypt_vault(PASSWORD, {"entries": [{"name": "gh"}]})
+    path = tmp_path / "v.json"
+    path.write_text(json.dumps(vault_json, separators=(",", ":")))
+    assert read_vault_header(str(path))["salt"] == vault_json["salt"]
+    assert decrypt_vault(PASSWORD, load_vault_file(str(path))) == {"entries": [{"name": "gh"}]}
+
+
+def test_wrong_password():
+    vault_json = encrypt_vault(PASSWORD, {"entries": []})
+    with pytest.raises(ValueError):
+        decrypt_vault("wrong", vault_json)
+
+
+@pytest.mark.parametrize("keep", [-1, -4, -8, 8, 0])
+def test_truncated_ciphertext(keep):
+    vault_json = encrypt_vault(PASSWORD, padded(CHUNK_SIZE + 1))
+    vault_json["ciphertext"] = vault_json["ciphertext"][:keep]
+    with pytest.raises(ValueError):
+        decrypt_vault(PASSWORD, vault_json)
+
+
+def test_tampered_ciphertext():
+    vault_json = encrypt_vault(PASSWORD, padded(CHUNK_SIZE))
+    ct = bytearray(base64.b64decode(vault_json["ciphertext"]))
+    ct[len(ct) // 2] ^= 1
+    vault_json["ciphertext"] = base64.b64encode(ct).decode()
+    with pytest.raises(ValueError):
+        decrypt_vault(PASSWORD, vault_json)
@@ -1,7 +1,4 @@
 import sys
-import os
-import json
-import base64
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
     QScrollArea, QFrame, QLabel, QPushButton, QMessageBox,
@@ -10,25 +7,10 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont, QPalette, QColor
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
-from cryptography.fernet import Fernet
 
-from vault import decrypt_vault, load_vault_file
+from vault import encrypt_vault, decrypt_vault, load_vault_file, atomic_write
 
 
-# Utility to derive a Fernet key from a password and salt
-def derive_key(password: str, salt: bytes) -> bytes:
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100_000,
-        backend=default_backend()
-    )
-    return base64.urlsafe_b64encode(kdf.derive(password.encode()))
-
 class AddEntryDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -142,17 +124,8 @@ class PasswordManager(QWidget):
         if not ok or not password:
             return
         try:
-            salt = os.urandom(16)
-            key = derive_key(password, salt)
-            fernet = Fernet(key)
-            data_bytes = json.dumps(self.entries).encode('utf-8')
-            token = fernet.encrypt(data_bytes)
-            vault_obj = {
-                'salt': base64.b64encode(salt).decode('utf-8'),
-                'data': token.decode('utf-8')
-            }
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(vault_obj, f)
+            # 统一写出当前格式；旧版 PBKDF2+Fernet 文件打开后再保存即完成升级
+            atomic_write(path, encrypt_vault(password, {"entries": self.entries}))
             QMessageBox.information(self, "Success", "Vault saved successfully.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save vault:\n{e}")
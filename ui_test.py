@@ -2,6 +2,7 @@ import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 from tkinter import simpledialog, filedialog
 from vault import encrypt_vault, decrypt_vault, load_vault_file, atomic_write
+from history import History
 import tkinter as tk
 
 
@@ -12,6 +13,7 @@ class VaultApp(tb.Window):
         self.geometry("800x600")
         self.vault = None
         self.file_path = None
+        self.history = None
 
         # ————— 主内容区 —————
         self.main_frame = tb.Frame(self)
@@ -116,6 +118,8 @@ class VaultApp(tb.Window):
         data={"entries":[]}
         atomic_write(path, encrypt_vault(pw,data))
         self.file_path,self.master_password,self.vault = path,pw,data
+        self._open_history(path, pw)
+        self._snapshot()
         self.refresh_cards()
         self._set_status("已初始化 Vault: " + path)
 
@@ -129,6 +133,7 @@ class VaultApp(tb.Window):
             self._set_status("错误: " + str(e))
             return
         self.file_path,self.master_password,self.vault=path,pw,data
+        self._open_history(path, pw)
         self.refresh_cards()
         self._set_status("已打开 Vault: " + path)
 
@@ -201,6 +206,23 @@ class VaultApp(tb.Window):
 
     def save_vault(self):
         atomic_write(self.file_path, encrypt_vault(self.master_password,self.vault))
+        # 内容未变化时（如自动保存）不会产生新快照
+        self._snapshot()
+
+    def _open_history(self, path, pw):
+        try:
+            self.history = History(path, pw)
+        except (OSError, ValueError) as e:
+            self.history = None
+            self._set_status("历史记录不可用: " + str(e))
+
+    def _snapshot(self):
+        # Vault 已写入，快照失败只提示，不影响保存
+        if not self.history: return
+        try:
+            self.history.snapshot(self.vault)
+        except (OSError, ValueError) as e:
+            self._set_status("未能记录历史快照: " + str(e))
 
     def _auto_save(self):
         if self.vault and self.file_path:
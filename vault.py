@@ -1,10 +1,38 @@
 import os
+import re
 import json
 import base64
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import binascii
+from cryptography.exceptions import InvalidSignature, InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes, hmac
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from argon2.low_level import hash_secret_raw, Type
 import tempfile
 
+CHUNK_SIZE = 3 << 18  # 流式处理的分块大小，取 3 的倍数使块间 base64 无填充
+TAG_SIZE = 16
+_ZEROS = bytes(CHUNK_SIZE)
+SNIFF_SIZE = 512
+CURRENT_FORMAT = "argon2id-aesgcm"
+LEGACY_FERNET_FORMAT = "pbkdf2-fernet"
+
+# 已注册的 Vault 文件格式，按注册顺序匹配：
+#   markers  文件开头必须匹配的字节正则，用于不解析整个文件的快速识别，不依赖 JSON 分隔符
+#   keys     已加载的 Vault JSON 必须包含的键
+#   bulk     体积最大且位于末尾的字段，读取文件头时在此截断
+#   decrypt  decrypt(password, vault_json) -> dict，密码错误或数据损坏时抛出 ValueError
+VAULT_FORMATS = {}
+
+
+def register_format(name: str, markers: tuple, keys: tuple, bulk: str, decrypt):
+    """
+    注册一种 Vault 文件格式
+    """
+    VAULT_FORMATS[name] = {"markers": markers, "keys": keys, "bulk": bulk, "decrypt": decrypt}
+
 
 def derive_key(password: str, salt: bytes) -> bytes:
     """
@@ -21,43 +49,249 @@ def derive_key(password: str, salt: bytes) -> bytes:
     )
 
 
+def subkey(key, info: bytes) -> bytes:
+    """
+    用 HKDF-SHA256 从主密钥派生指定用途的子密钥
+    """
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info).derive(bytes(key))
+
+
+def store_key(store_dir: str, password: str) -> bytearray:
+    """
+    派生附属存储（历史记录、附件等）的主密钥
+
+    salt 保存在 store_dir/keyring.json，与 Vault 文件自身的 salt 无关，
+    因此 Vault 每次保存更换 salt 后该密钥依然不变。
+    """
+    path = os.path.join(store_dir, "keyring.json")
+    if os.path.exists(path):
+        keyring = load_vault_file(path)
+        key = bytearray(derive_key(password, base64.b64decode(keyring["salt"])))
+        mac = hmac.HMAC(subkey(key, b"keyring-check"), hashes.SHA256())
+        try:
+            mac.update(b"keyring")
+            mac.verify(base64.b64decode(keyring["check"]))
+        except InvalidSignature:
+            _wipe(key)
+            raise ValueError(f"主密码与该存储不匹配: {store_dir}")
+        return key
+    os.makedirs(store_dir, exist_ok=True)
+    salt = os.urandom(16)
+    key = bytearray(derive_key(password, salt))
+    mac = hmac.HMAC(subkey(key, b"keyring-check"), hashes.SHA256())
+    mac.update(b"keyring")
+    atomic_write(path, {
+        "kdf": "argon2id",
+        "salt": base64.b64encode(salt).decode(),
+        "check": base64.b64encode(mac.finalize()).decode()
+    })
+    return key
+
+
+def _wipe(buf: bytearray):
+    """
+    将可变缓冲区原地清零，按块覆盖以免分配同等大小的零串
+    """
+    for i in range(0, len(buf), CHUNK_SIZE):
+        n = min(CHUNK_SIZE, len(buf) - i)
+        buf[i:i + n] = _ZEROS[:n]
+
+
+def _b64_into(out: bytearray, pos: int, data) -> int:
+    """
+    将 data 的 base64 编码写入 out[pos:]，返回新的写入位置
+    """
+    enc = binascii.b2a_base64(data, newline=False)
+    out[pos:pos + len(enc)] = enc
+    return pos + len(enc)
+
+
 def encrypt_vault(password: str, data: dict) -> dict:
     """
     输入明文数据 dict，返回包含 salt/nonce/ciphertext 的加密 Vault JSON
     """
     salt = os.urandom(16)
-    key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
+    key = bytearray(derive_key(password, salt))
+    try:
+        return encrypt_with_key(key, salt, data)
+    finally:
+        _wipe(key)
+
+
+def encrypt_with_key(key, salt: bytes, data: dict) -> dict:
+    """
+    使用已派生的密钥加密，salt 仅写入 Vault JSON 供下次派生，每次使用新的 nonce
+
+    明文按块加密并直接编码进预分配的 base64 缓冲区，不会生成完整的明文/密文字节串
+    """
     nonce = os.urandom(12)
-    plaintext = json.dumps(data).encode()
-    ct = aesgcm.encrypt(nonce, plaintext, None)
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).encryptor()
+    # ensure_ascii 默认开启，字符数即明文字节数
+    text = json.dumps(data)
+    out = bytearray((len(text) + TAG_SIZE + 2) // 3 * 4)
+    buf = bytearray(CHUNK_SIZE + 15)
+    pos = 0
+    tail = b""
+    for i in range(0, len(text), CHUNK_SIZE):
+        n = encryptor.update_into(text[i:i + CHUNK_SIZE].encode(), buf)
+        if i + CHUNK_SIZE < len(text):
+            pos = _b64_into(out, pos, memoryview(buf)[:n])
+        else:
+            tail = bytes(buf[:n])
+    del text
+    encryptor.finalize()
+    _b64_into(out, pos, tail + encryptor.tag)
     return {
         "kdf": "argon2id",
         "salt": base64.b64encode(salt).decode(),
         "nonce": base64.b64encode(nonce).decode(),
-        "ciphertext": base64.b64encode(ct).decode()
+        "ciphertext": out.decode()
     }
 
 
 def decrypt_vault(password: str, vault_json: dict) -> dict:
     """
-    从加密 Vault JSON 解密并返回明文数据 dict
+    从加密 Vault JSON 解密并返回明文数据 dict，旧格式按注册的解密函数读取
+
+    主密码错误或密文损坏时，各格式的解密函数统一抛出 ValueError
+    """
+    return VAULT_FORMATS[detect_format(vault_json)]["decrypt"](password, vault_json)
+
+
+def _decrypt_argon2id(password: str, vault_json: dict) -> dict:
+    """
+    当前格式：Argon2id 派生密钥 + AES-GCM
     """
     salt = base64.b64decode(vault_json["salt"])
+    key = bytearray(derive_key(password, salt))
+    try:
+        return decrypt_with_key(key, vault_json)
+    finally:
+        _wipe(key)
+
+
+def decrypt_with_key(key, vault_json: dict) -> dict:
+    """
+    使用已派生的密钥解密 Vault JSON
+
+    密文按块解码、解密到可清零的 bytearray 中，转为 str 后立即清零再解析
+    """
     nonce = base64.b64decode(vault_json["nonce"])
-    ct = base64.b64decode(vault_json["ciphertext"])
-    key = derive_key(password, salt)
-    aesgcm = AESGCM(key)
-    pt = aesgcm.decrypt(nonce, ct, None)
-    return json.loads(pt.decode())
+    b64 = vault_json["ciphertext"]
+    size = len(b64) // 4 * 3 - b64[-2:].count("=")
+    if len(b64) % 4 or size < TAG_SIZE:
+        raise ValueError("Vault 密文长度无效，文件可能已损坏。")
+    ct_len = size - TAG_SIZE
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(nonce)).decryptor()
+    pt = bytearray(ct_len + 15)
+    view = memoryview(pt)
+    try:
+        tag = b""
+        off = 0
+        step = CHUNK_SIZE // 3 * 4
+        for i in range(0, len(b64), step):
+            chunk = binascii.a2b_base64(b64[i:i + step])
+            body = max(0, min(len(chunk), ct_len - off))
+            if body:
+                decryptor.update_into(memoryview(chunk)[:body], view[off:])
+            tag += chunk[body:]
+            off += len(chunk)
+        try:
+            decryptor.finalize_with_tag(tag)
+        except InvalidTag:
+            raise ValueError("主密码错误，或 Vault 文件已损坏。")
+        text = str(view[:ct_len], 'utf-8')
+    finally:
+        view.release()
+        _wipe(pt)
+    del pt
+    return json.loads(text)
+
+def _decrypt_fernet(password: str, vault_json: dict) -> dict:
+    """
+    旧格式：ui.py/main_ui.py 早期写出的 PBKDF2-SHA256 + Fernet 文件，明文为条目列表
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=base64.b64decode(vault_json["salt"]),
+        iterations=100_000
+    )
+    key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
+    try:
+        plaintext = Fernet(key).decrypt(vault_json["data"].encode())
+    except InvalidToken:
+        raise ValueError("主密码错误，或旧版 Vault 文件已损坏。")
+    data = json.loads(plaintext)
+    return data if isinstance(data, dict) else {"entries": data}
+
+
+register_format(CURRENT_FORMAT, (rb'"kdf"\s*:\s*"argon2id"',),
+                ("kdf", "salt", "nonce", "ciphertext"), "ciphertext", _decrypt_argon2id)
+register_format(LEGACY_FERNET_FORMAT, (rb'"salt"\s*:', rb'"data"\s*:\s*"gAAAAA'),
+                ("salt", "data"), "data", _decrypt_fernet)
+
+
+def detect_format(vault_json: dict) -> str:
+    """
+    根据已加载的 Vault JSON 的键判断格式
+    """
+    for name, fmt in VAULT_FORMATS.items():
+        if all(k in vault_json for k in fmt["keys"]):
+            return name
+    raise ValueError("无法识别的 Vault 格式。")
+
+
+def _read_head(path: str) -> bytes:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(SNIFF_SIZE)
+    except FileNotFoundError:
+        raise ValueError(f"找不到 Vault 文件: {path}")
+
+
+def _sniff(head: bytes, path: str) -> str:
+    for name, fmt in VAULT_FORMATS.items():
+        if all(re.search(m, head) for m in fmt["markers"]):
+            return name
+    raise ValueError(f"无法识别的 Vault 格式: {path}")
+
+
+def sniff_format(path: str) -> str:
+    """
+    只读取文件开头判断 Vault 格式，不解析整个文件
+    """
+    return _sniff(_read_head(path), path)
+
+
+def _json_safe(s: str) -> bool:
+    """
+    判断字符串按 json.dump（ensure_ascii）输出时是否无需任何转义
+    """
+    return s.isascii() and s.isprintable() and '"' not in s and '\\' not in s
+
 
 def atomic_write(path: str, content: dict):
     """
     原子化写入 JSON 文件，避免写入中断导致损坏
+
+    无需转义的长字符串（如 base64 密文）按块直接写出，不再整体复制一份
     """
     dir_name = os.path.dirname(path) or '.'
     with tempfile.NamedTemporaryFile('w', dir=dir_name, delete=False) as tf:
-        json.dump(content, tf)
+        tf.write('{')
+        for i, (k, v) in enumerate(content.items()):
+            if i:
+                tf.write(', ')
+            tf.write(json.dumps(k) + ': ')
+            if isinstance(v, str) and len(v) > CHUNK_SIZE and _json_safe(v):
+                tf.write('"')
+                for j in range(0, len(v), CHUNK_SIZE):
+                    tf.write(v[j:j + CHUNK_SIZE])
+                tf.write('"')
+            else:
+                json.dump(v, tf)
+        tf.write('}')
         tf.flush()
         os.fsync(tf.fileno())
     os.replace(tf.name, path)
@@ -74,4 +308,25 @@ def load_vault_file(path: str) -> dict:
     except json.JSONDecodeError:
         raise ValueError("Vault 文件不是有效的 JSON，请检查文件路径和内容。")
     except FileNotFoundError:
-        raise ValueError(f"找不到 Vault 文件: {path}")
\ No newline at end of file
+        raise ValueError(f"找不到 Vault 文件: {path}")
+
+def read_vault_header(path: str) -> dict:
+    """
+    只读取 Vault 文件开头的小字段（如 kdf/salt/nonce），不解析整个密文
+
+    按格式的 bulk 字段截断文件头解析；atomic_write 保持写入顺序，密文总在最后。
+    不符合该布局的文件退回完整加载。
+    """
+    head = _read_head(path)
+    bulk = VAULT_FORMATS[_sniff(head, path)]["bulk"]
+    pos = head.find(b'"%s"' % bulk.encode())
+    if pos > 0:
+        try:
+            header = json.loads(head[:pos].rstrip(b', \t\r\n') + b'}')
+            if "salt" in header:
+                return header
+        except ValueError:
+            pass
+    vault_json = load_vault_file(path)
+    vault_json.pop(bulk, None)
+    return vault_json